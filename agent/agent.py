@@ -7,23 +7,31 @@ import asyncio
 import hashlib
 import json
 import os
+import queue
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional, Tuple
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError as exc:  # pragma: no cover - guard for missing dependency
     print("Error: The 'requests' package is required. Install it with 'pip install requests'.")
     raise SystemExit(1) from exc
 
+_HERE = Path(__file__).resolve()
+_ROOT = _HERE.parent.parent
+_ROOT_STR = str(_ROOT)
+
 # Make local modules importable when executing as a script.
-sys.path.append(str(Path(__file__).parent.parent))
+sys.path.insert(0, _ROOT_STR)
 
 try:
     from chaoschain_sdk import ChaosChainAgentSDK
-    from storage.filecoin_pin_provider import FilecoinPinStorageProvider
+    from storage.filecoin_pin_provider import FilecoinPinStorageProvider, dumps_json_bytes
 except ImportError as exc:
     print(f"Error: required dependencies not installed: {exc}")
     print("Ensure 'chaoschain-sdk' is installed and the repository's root is on PYTHONPATH.")
@@ -34,7 +42,36 @@ NETWORK = os.getenv("CHAOS_NETWORK", "base-sepolia")
 AGENT_NAME = os.getenv("CHAOS_AGENT_NAME", "FilecoinPinDemoAgent")
 AGENT_DOMAIN = os.getenv("CHAOS_AGENT_DOMAIN", "demo.chaoscha.in")
 AGENT_ROLE = os.getenv("CHAOS_AGENT_ROLE", "server")
-RECEIPTS_DIR = Path(__file__).parent.parent / "receipts"
+HASH_ALGORITHM = os.getenv("CHAOS_HASH", "sha256").lower()
+RECEIPTS_DIR = _ROOT / "receipts"
+
+# Shared session so repeated gateway checks reuse pooled TLS connections.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=Retry(total=0)),
+)
+
+# SHA-256 is the default because external verifiers recompute it; BLAKE3 is
+# faster but produces different digests, so it is strictly opt-in.
+if HASH_ALGORITHM not in ("sha256", "blake3"):
+    print(f"Error: unsupported CHAOS_HASH '{HASH_ALGORITHM}'; use 'sha256' or 'blake3'.")
+    raise SystemExit(1)
+
+_hasher = hashlib.sha256
+if HASH_ALGORITHM == "blake3":
+    try:
+        from blake3 import blake3 as _hasher
+    except ImportError as exc:
+        print("Error: CHAOS_HASH=blake3 requires the 'blake3' package.")
+        print("Install it with 'pip install blake3' or unset CHAOS_HASH.")
+        raise SystemExit(1) from exc
+
+VERIFY_URL_TEMPLATES = (
+    "https://filecoinpin.contact/cid/{cid}",
+    "https://dweb.link/ipfs/{cid}",
+    "https://ipfs.io/ipfs/{cid}",
+)
 
 RPC_ENV_MAPPINGS = {
     "BASE_SEPOLIA_RPC_URL": "BASE-SEPOLIA_RPC_URL",
@@ -57,7 +94,10 @@ def create_sdk() -> ChaosChainAgentSDK:
             bare=os.getenv("FILECOIN_PIN_BARE", "false").lower() == "true",
             verbose=os.getenv("FILECOIN_PIN_VERBOSE", "false").lower() == "true",
             private_key=os.getenv("FILECOIN_CALIBRATION_PRIVATE_KEY"),
+            stdin_upload=os.getenv("FILECOIN_PIN_STDIN", "false").lower() == "true",
         )
+        # Fail before any on-chain registration if the CLI is unusable.
+        storage_provider.verify_cli()
         print("Storage provider initialised.")
     except Exception as exc:  # pragma: no cover - CLI validation
         print(f"Failed to initialise Filecoin Pin storage provider: {exc}")
@@ -76,49 +116,98 @@ def create_sdk() -> ChaosChainAgentSDK:
 
 
 def verify_ipfs_content(cid: str) -> bool:
-    """Verify CID reachability via filecoinpin.contact."""
+    """Verify CID reachability by racing HEAD probes against public gateways."""
     if not cid:
         return False
 
-    contact_url = f"https://filecoinpin.contact/cid/{cid}"
+    urls = [template.format(cid=cid) for template in VERIFY_URL_TEMPLATES]
 
     print("Verifying IPFS content availability...")
 
-    try:
-        print(f"Checking: {contact_url}")
-        response = requests.get(contact_url, timeout=10)
-        if response.status_code == 200:
-            print("IPFS content is reachable via filecoinpin.contact.")
+    # Probes run on daemon threads so the losers never hold up interpreter exit
+    # once a winner has answered.
+    outcomes: queue.Queue = queue.Queue()
+    for url in urls:
+        print(f"Checking: {url}")
+        threading.Thread(target=_probe_gateway, args=(url, outcomes), daemon=True).start()
+
+    for _ in urls:
+        url, outcome = outcomes.get()
+        if isinstance(outcome, Exception):
+            print(f"Could not verify IPFS content via {url}: {outcome}")
+            continue
+        if outcome.status_code < 400:
+            print(f"IPFS content is reachable via {url}.")
             return True
-        print(f"filecoinpin.contact returned status {response.status_code}.")
-    except requests.exceptions.RequestException as exc:
-        print(f"Could not verify IPFS content via filecoinpin.contact: {exc}")
+        print(f"{url} returned status {outcome.status_code}.")
 
     return False
 
 
+def _probe_gateway(url: str, outcomes: queue.Queue) -> None:
+    """Send one HEAD probe and report ``(url, response or exception)`` on ``outcomes``."""
+    try:
+        outcome = _SESSION.head(url, timeout=10, allow_redirects=True)
+    except Exception as exc:
+        outcome = exc
+    outcomes.put((url, outcome))
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write ``data`` to ``path`` via a synced temp file so readers never see a partial file."""
+    tmp_path = path.with_suffix(".tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    # Sync the directory so the rename itself survives a crash (POSIX only).
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
 async def demo_function(
     hello: str = "world",
     demo: str = "chaoschain-filecoin-pin-integration",
     timestamp: Optional[str] = None,
 ) -> Dict[str, str]:
     """Sample workload executed under ChaosChain process integrity."""
+    now_iso = datetime.now().isoformat()
+    # Keys are inserted in sorted order so the digest input is canonical without
+    # a per-call sort; reordering them changes every computation hash (see
+    # tests/test_agent.py).
     payload = {
-        "hello": hello,
         "demo": demo,
-        "timestamp": timestamp or datetime.now().isoformat(),
+        "hello": hello,
+        "timestamp": timestamp or now_iso,
     }
     print(f"Executing demo function with payload: {payload}")
 
-    digest_input = json.dumps(payload, sort_keys=True).encode("utf-8")
-    computation_hash = hashlib.sha256(digest_input).hexdigest()
+    # Stdlib json on purpose: its default ", "/": " separators are the digest
+    # format verifiers have always recomputed, so hashes stay stable.
+    digest_input = json.dumps(payload).encode("utf-8")
+    computation_hash = _hasher(digest_input).hexdigest()
 
     result = {
         "echo": payload,
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now_iso,
         "agent": AGENT_NAME,
         "network": NETWORK,
         "computation_hash": computation_hash,
+        "hash_algorithm": HASH_ALGORITHM,
     }
 
     print(f"Function result: {result}")
@@ -139,6 +228,11 @@ async def main() -> Tuple[str, bool]:
         print("Initialising ChaosChain SDK...")
         sdk = create_sdk()
 
+        # One snapshot keeps every timestamp in this run identical and correlatable.
+        now = datetime.now()
+        now_iso = now.isoformat()
+        now_stamp = now.strftime("%Y%m%d_%H%M%S")
+
         print("Registering agent identity...")
         sdk.register_identity()
         print("Agent identity registered.")
@@ -151,7 +245,7 @@ async def main() -> Tuple[str, bool]:
         payload = {
             "hello": "world",
             "demo": "chaoschain-filecoin-pin-integration",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now_iso,
         }
 
         result, proof = await sdk.execute_with_integrity_proof("demo_function", payload)
@@ -160,20 +254,24 @@ async def main() -> Tuple[str, bool]:
         print(f"Proof: {proof}")
 
         proof_cid = proof.ipfs_cid if hasattr(proof, "ipfs_cid") else str(proof)
+        ipfs_uri = f"ipfs://{proof_cid}"
+        dweb_view = f"https://{proof_cid}.ipfs.dweb.link/chaoschain_proof.json"
+        browser_link = f"https://inbrowser.link/ipfs/{proof_cid}"
+        has_cid = bool(proof_cid) and proof_cid != "None"
+        # The first verification template is the filecoinpin.contact page.
+        contact_url = VERIFY_URL_TEMPLATES[0].format(cid=proof_cid) if has_cid else None
 
         print("\n" + "=" * 60)
         print("Proof automatically pinned to Filecoin")
         print("=" * 60)
         print(f"PROOF_CID={proof_cid}")
-        print(f"IPFS_URI=ipfs://{proof_cid}")
-        print(f"VIEW_URL=https://{proof_cid}.ipfs.dweb.link/chaoschain_proof.json")
+        print(f"IPFS_URI={ipfs_uri}")
+        print(f"VIEW_URL={dweb_view}")
 
         is_accessible = False
-        contact_url: Optional[str] = None
-        if proof_cid and proof_cid != "None":
-            contact_url = f"https://filecoinpin.contact/cid/{proof_cid}"
+        if has_cid:
             is_accessible = verify_ipfs_content(proof_cid)
-            print(f"BROWSER_LINK=https://inbrowser.link/ipfs/{proof_cid}")
+            print(f"BROWSER_LINK={browser_link}")
             if is_accessible:
                 print("Content verified as accessible.")
             else:
@@ -187,34 +285,34 @@ async def main() -> Tuple[str, bool]:
             "proof_cid": proof_cid,
             "result": result,
             "proof": str(proof),
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now_iso,
             "agent": AGENT_NAME,
             "network": NETWORK,
             "storage_provider": "filecoin-pin",
             "automatically_pinned": True,
             "urls": {
-                "ipfs_uri": f"ipfs://{proof_cid}",
-                "view_url": f"https://{proof_cid}.ipfs.dweb.link/chaoschain_proof.json",
-                "dweb_gateway": f"https://{proof_cid}.ipfs.dweb.link/chaoschain_proof.json",
-                "browser_link": f"https://inbrowser.link/ipfs/{proof_cid}",
+                "ipfs_uri": ipfs_uri,
+                "view_url": dweb_view,
+                "dweb_gateway": dweb_view,
+                "browser_link": browser_link,
                 "filecoinpin_contact": contact_url,
             },
             "verification": {
                 "accessible": is_accessible,
+                # Taken after the gateway probes, not from the run snapshot.
                 "verified_at": datetime.now().isoformat(),
             },
         }
 
         RECEIPTS_DIR.mkdir(exist_ok=True)
-        proof_file = RECEIPTS_DIR / f"chaos_proof_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with proof_file.open("w", encoding="utf-8") as handle:
-            json.dump(proof_data, handle, indent=2)
+        proof_file = RECEIPTS_DIR / f"chaos_proof_{now_stamp}.json"
+        write_atomic(proof_file, dumps_json_bytes(proof_data, pretty=True))
 
         print(f"Proof data saved to: {proof_file}")
         print("\nThe proof is now durably stored via Filecoin Pin.")
         print("Copy-ready inspection commands:")
-        if proof_cid and proof_cid != "None":
-            print(f'  curl -s "https://{proof_cid}.ipfs.dweb.link/chaoschain_proof.json" | jq')
+        if has_cid:
+            print(f'  curl -s "{dweb_view}" | jq')
         print(f"  jq '.' {proof_file.as_posix()}")
 
         return proof_cid, is_accessible
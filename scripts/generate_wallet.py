@@ -8,6 +8,9 @@ import os
 import sys
 from pathlib import Path
 
+_HERE = Path(__file__).resolve()
+_ROOT = _HERE.parent.parent
+
 
 def error(message: str) -> None:
     """Print an error message and exit."""
@@ -42,7 +45,7 @@ def main() -> None:
         }
     }
 
-    output_path = Path(__file__).resolve().parents[1] / "chaoschain_wallets.json"
+    output_path = _ROOT / "chaoschain_wallets.json"
     output_path.write_text(json.dumps(wallet_data, indent=2), encoding="utf-8")
 
     print(f"ChaosChain wallet created for {agent_name} at {wallet_address}")
@@ -3,15 +3,116 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import queue
 import re
 import shutil
 import subprocess
 import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    orjson = None
+
+# Shared session so gateway requests reuse pooled TLS connections.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=Retry(total=0)),
+)
+
+_GATEWAY_TEMPLATES = (
+    "https://ipfs.io/ipfs/{cid}",
+    "https://gateway.pinata.cloud/ipfs/{cid}",
+    "https://cloudflare-ipfs.com/ipfs/{cid}",
+    "https://dweb.link/ipfs/{cid}",
+)
+
+# Small payloads are staged on RAM-backed tmpfs when it exists (Linux). Windows
+# and macOS have no /dev/shm and fall through to the default temp dir.
+_SHM_DIR: Optional[str] = "/dev/shm" if os.path.isdir("/dev/shm") else None
+_SHM_MAX_BYTES = 8 * 1024 * 1024
+
+_MIME_TO_NAME: Dict[str, str] = {"application/json": "chaoschain_proof.json"}
+
+# Line breaks honoured by str.splitlines() in the ASCII range; progress spinners
+# redraw the current line after a bare \r, so \n alone is not a line boundary.
+_LINE_BREAKS = rb"\n\r\x0b\x0c\x1c\x1d\x1e"
+
+# One alternative per CLI field; the group name is the metadata key it fills.
+# Matches raw stdout bytes; \xe2\x94\x82 is the UTF-8 box-drawing "│" prefix.
+_CLI_FIELDS_RE = re.compile(
+    rb"(?:\A|(?<=[%(eol)s]))(?:"
+    rb"[^%(eol)s]*?Root CID:(?P<root_cid>[^%(eol)s]*)"
+    rb"|[^%(eol)s]*?Piece CID:(?P<piece_cid>[^%(eol)s]*)"
+    rb"|[^%(eol)s]*?Data Set ID:(?P<data_set_id>[^%(eol)s]*)"
+    rb"|[^\S%(eol)s]*\xe2\x94\x82 Hash:(?P<transaction_hash>[^%(eol)s]*)"
+    rb"|[^%(eol)s]*?IPFS content loaded \((?P<file_size_display>[^)%(eol)s]+)\)"
+    rb")" % {b"eol": _LINE_BREAKS}
+)
+
+# `add --help` must show `-` as a delimited path token (`<path|->`, '-', `-`) on a
+# line that also mentions stdin; a passing mention of stdin is not enough.
+_STDIN_PATH_RE = re.compile(rb"^(?=[^\n]*\bstdin\b)[^\n]*[|<\[\"'`]-[|>\]\"'`]", re.I | re.M)
+
+# Verified CLI binaries keyed by (path, mtime) -> version string.
+_VERIFIED: Dict[Tuple[str, float], str] = {}
+
+# Stdin capability per verified binary, probed only for providers that opt in.
+_STDIN_SUPPORT: Dict[Tuple[str, float], bool] = {}
+
+# CIDs are immutable, so retrieved content can be served from memory.
+_CID_CACHE_MAX = 128
+
+
+def dumps_json_bytes(obj: Any, *, pretty: bool = False, sort_keys: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            # orjson rejects ints wider than 64 bits (e.g. wei amounts) and
+            # non-str dict keys; stdlib json accepts both.
+            pass
+    # Match orjson's layout so output does not depend on which backend is present.
+    return json.dumps(
+        obj,
+        indent=2 if pretty else None,
+        separators=None if pretty else (",", ":"),
+        sort_keys=sort_keys,
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+
+@contextmanager
+def _staging_dir(size: int) -> Iterator[str]:
+    """Create the upload staging directory, in RAM when the payload is small enough."""
+    temp_dir = tempfile.mkdtemp(
+        prefix="chaoschain_filecoin_pin_",
+        dir=_SHM_DIR if size <= _SHM_MAX_BYTES else None,
+    )
+    try:
+        yield temp_dir
+    finally:
+        # Cleanup errors are ignored: by now the CLI may already have pinned the CID.
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
 
 @dataclass
@@ -46,6 +147,7 @@ class FilecoinPinStorageProvider:
         bare: bool = False,
         verbose: bool = False,
         private_key: Optional[str] = None,
+        stdin_upload: bool = False,
     ) -> None:
         """
         Initialize the Filecoin Pin storage provider.
@@ -56,91 +158,236 @@ class FilecoinPinStorageProvider:
             bare: Add file without directory wrapper
             verbose: Enable verbose output from filecoin-pin
             private_key: Private key for authentication (can also use PRIVATE_KEY env)
+            stdin_upload: Stream bare uploads over stdin when the CLI advertises `-`
+                as a path (opt-in; temp files are used otherwise)
         """
-        self.filecoin_pin_path: str = filecoin_pin_path
+        # Resolve against $PATH once so every spawn execs the same absolute binary.
+        self.filecoin_pin_path: str = shutil.which(filecoin_pin_path) or filecoin_pin_path
         self.auto_fund: bool = auto_fund
         self.bare: bool = bare
         self.verbose: bool = verbose
         self.private_key: Optional[str] = private_key
-
+        self.stdin_upload: bool = stdin_upload
+
+        # Flags never change after construction, so build the option suffixes once.
+        # --bare only applies to single files, so directory uploads leave it out.
+        suffix: list[str] = []
+        if auto_fund:
+            suffix.append("--auto-fund")
+        if verbose:
+            suffix.append("--verbose")
+        if private_key:
+            suffix.extend(["--private-key", private_key])
+        self._dir_cmd_suffix: Tuple[str, ...] = tuple(suffix)
+        self._cmd_suffix: Tuple[str, ...] = (
+            ("--bare", *self._dir_cmd_suffix) if bare else self._dir_cmd_suffix
+        )
+
+        self._cid_cache: OrderedDict[str, Tuple[bytes, Dict]] = OrderedDict()
+        self._cid_cache_lock = threading.Lock()
+
+        # Verification is deferred to the first upload; see _ensure_verified.
+        self._stdin_supported: bool = False
+
+    @cached_property
+    def _ensure_verified(self) -> str:
+        """Verify the CLI on first use so constructing a provider never forks."""
         self._verify_filecoin_pin()
+        return "ok"
+
+    def verify_cli(self) -> None:
+        """
+        Verify the filecoin-pin CLI now instead of on the first upload.
+
+        Raises:
+            RuntimeError: If the CLI is missing, exits non-zero, or times out
+        """
+        _ = self._ensure_verified
 
     def _verify_filecoin_pin(self) -> None:
         """Ensure the filecoin-pin CLI is available before continuing."""
         try:
-            result = subprocess.run(
-                [self.filecoin_pin_path, "--version"],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            if result.returncode != 0:
-                raise RuntimeError(
-                    f"filecoin-pin CLI returned non-zero exit code: {result.stderr.strip()}"
+            key = (self.filecoin_pin_path, os.path.getmtime(self.filecoin_pin_path))
+            if key not in _VERIFIED:
+                result = subprocess.run(
+                    [self.filecoin_pin_path, "--version"],
+                    capture_output=True,
+                    timeout=10
                 )
-            print(f"filecoin-pin detected: {result.stdout.strip()}")
+                if result.returncode != 0:
+                    stderr = result.stderr.decode("utf-8", "replace").strip()
+                    raise RuntimeError(f"filecoin-pin CLI returned non-zero exit code: {stderr}")
+                version = result.stdout.decode("utf-8", "replace").strip()
+                print(f"filecoin-pin detected: {version}")
+                _VERIFIED[key] = version
+
+            if self.stdin_upload:
+                if key not in _STDIN_SUPPORT:
+                    _STDIN_SUPPORT[key] = self._detect_stdin_support()
+                self._stdin_supported = _STDIN_SUPPORT[key]
         except FileNotFoundError:
             raise RuntimeError(f"filecoin-pin not found at path: {self.filecoin_pin_path}")
         except subprocess.TimeoutExpired:
             raise RuntimeError("filecoin-pin version command timed out")
 
+    def _detect_stdin_support(self) -> bool:
+        """Check whether `filecoin-pin add --help` advertises `-` as a stdin path."""
+        try:
+            result = subprocess.run(
+                [self.filecoin_pin_path, "add", "--help"],
+                capture_output=True,
+                timeout=10
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return result.returncode == 0 and _STDIN_PATH_RE.search(result.stdout) is not None
+
+    def _reads_stdin(self) -> bool:
+        """
+        Return True when uploads should be streamed to the CLI over stdin.
+
+        Requires the stdin_upload opt-in and a CLI whose help advertises `-`.
+        Only bare uploads qualify: without --bare the CLI wraps the file in a
+        directory named after it, and that filename is part of the view URL.
+        """
+        return self._stdin_supported and self.bare
+
     @staticmethod
     def _filename_for_mime(mime: Optional[str]) -> str:
         """Return a user-friendly filename based on MIME type."""
-        if mime == "application/json":
-            return "chaoschain_proof.json"
+        if mime in _MIME_TO_NAME:
+            return _MIME_TO_NAME[mime]
         if mime and mime.startswith("text/"):
             return "chaoschain_payload.txt"
         return "chaoschain_payload.bin"
 
-    def _build_command(self, temp_path: str) -> list[str]:
-        """Build the CLI command used to store the provided file."""
-        command = [self.filecoin_pin_path, "add", temp_path]
+    def _build_command(self, temp_path: str, *, directory: bool = False) -> list[str]:
+        """Build the CLI command used to store the provided file or directory."""
+        suffix = self._dir_cmd_suffix if directory else self._cmd_suffix
+        return [self.filecoin_pin_path, "add", temp_path, *suffix]
 
-        if self.auto_fund:
-            command.append("--auto-fund")
+    @staticmethod
+    def _parse_cli_output(output: bytes) -> Dict[str, Optional[str]]:
+        """Extract relevant metadata from the raw filecoin-pin CLI output."""
+        fields: Dict[str, str] = {}
+        for match in _CLI_FIELDS_RE.finditer(output):
+            value = match.group(match.lastgroup)
+            fields[match.lastgroup] = value.decode("utf-8", "replace").strip()
 
-        if self.bare:
-            command.append("--bare")
+        return {
+            "root_cid": fields.get("root_cid"),
+            "piece_cid": fields.get("piece_cid"),
+            "data_set_id": fields.get("data_set_id"),
+            "transaction_hash": fields.get("transaction_hash"),
+            "file_size_display": fields.get("file_size_display"),
+        }
 
-        if self.verbose:
-            command.append("--verbose")
+    def _upload_metadata(
+        self, result: subprocess.CompletedProcess
+    ) -> Tuple[Dict[str, Optional[str]], Optional[str]]:
+        """Parse a finished `filecoin-pin add` run into (metadata, error message)."""
+        if result.returncode == 0:
+            metadata = self._parse_cli_output(result.stdout)
+            root_cid = metadata.get("root_cid")
+
+            if not root_cid:
+                print("filecoin-pin completed but no Root CID was found in the output.")
+                print("stdout:\n", result.stdout.decode("utf-8", "replace"))
+                print("stderr:\n", result.stderr.decode("utf-8", "replace"))
+                return metadata, "filecoin-pin completed without returning a Root CID"
+
+            print(f"Upload successful. Root CID: {root_cid}")
+            return metadata, None
+
+        stderr = result.stderr.decode("utf-8", "replace")
+        print("filecoin-pin returned a non-zero exit code.")
+        print("stdout:\n", result.stdout.decode("utf-8", "replace"))
+        print("stderr:\n", stderr)
+        return {}, stderr.strip() or "filecoin-pin command failed"
 
-        if self.private_key:
-            command.extend(["--private-key", self.private_key])
+    @staticmethod
+    def _stored_result(
+        metadata: Dict[str, Optional[str]],
+        blob: bytes,
+        *,
+        mime: Optional[str],
+        tags: Optional[Dict[str, str]],
+        payload_filename: str,
+        nested: bool = False,
+    ) -> StorageResult:
+        """
+        Build the StorageResult for a payload of a successful upload.
 
-        return command
+        When ``nested`` is set the payload is one file inside the uploaded
+        directory, so its URI points at the file path beneath the Root CID.
+        """
+        root_cid = metadata["root_cid"]
+        uri = f"ipfs://{root_cid}/{payload_filename}" if nested else f"ipfs://{root_cid}"
+        dweb_url = f"https://{root_cid}.ipfs.dweb.link/{payload_filename}"
+        return StorageResult(
+            success=True,
+            uri=uri,
+            hash=root_cid,
+            provider="filecoin-pin",
+            cid=root_cid,
+            view_url=dweb_url,
+            size=len(blob),
+            metadata={
+                "piece_cid": metadata.get("piece_cid"),
+                "data_set_id": metadata.get("data_set_id"),
+                "transaction_hash": metadata.get("transaction_hash"),
+                "file_size_display": metadata.get("file_size_display"),
+                "mime_type": mime,
+                "tags": tags or {},
+                "filecoin_pin": True,
+                "payload_filename": payload_filename,
+                "dweb_gateway_url": dweb_url,
+            },
+        )
 
     @staticmethod
-    def _parse_cli_output(output: str) -> Dict[str, Optional[str]]:
-        """Extract relevant metadata from the filecoin-pin CLI output."""
-        root_cid: Optional[str] = None
-        piece_cid: Optional[str] = None
-        data_set_id: Optional[str] = None
-        transaction_hash: Optional[str] = None
-        file_size: Optional[str] = None
-
-        for line in output.splitlines():
-            if "Root CID:" in line:
-                root_cid = line.split("Root CID:")[1].strip()
-            elif "Piece CID:" in line:
-                piece_cid = line.split("Piece CID:")[1].strip()
-            elif "Data Set ID:" in line:
-                data_set_id = line.split("Data Set ID:")[1].strip()
-            elif line.strip().startswith("│ Hash:"):
-                transaction_hash = line.split("Hash:")[1].strip()
-            elif "IPFS content loaded (" in line:
-                match = re.search(r"IPFS content loaded \(([^)]+)\)", line)
-                if match:
-                    file_size = match.group(1)
+    def _upload_error(exc: Exception) -> str:
+        """Describe an exception raised while running an upload."""
+        if isinstance(exc, subprocess.TimeoutExpired):
+            return "filecoin-pin command timed out after 5 minutes"
+        return f"Storage error: {exc}"
+
+    @contextmanager
+    def _single_upload(
+        self, blob: bytes, payload_filename: str
+    ) -> Iterator[Tuple[list[str], Optional[bytes]]]:
+        """
+        Yield the (command, stdin data) pair that uploads ``blob`` as one file.
 
-        return {
-            "root_cid": root_cid,
-            "piece_cid": piece_cid,
-            "data_set_id": data_set_id,
-            "transaction_hash": transaction_hash,
-            "file_size_display": file_size,
-        }
+        The payload goes over stdin when _reads_stdin() allows it; otherwise it
+        is staged in a temp file that is removed when the block exits.
+        """
+        print(f"Uploading {len(blob)} bytes via filecoin-pin...")
+        if self._reads_stdin():
+            yield self._build_command("-"), blob
+            return
+
+        with _staging_dir(len(blob)) as temp_dir:
+            temp_path = Path(temp_dir) / payload_filename
+            temp_path.write_bytes(blob)
+            yield self._build_command(str(temp_path)), None
+
+    def _single_result(
+        self,
+        result: subprocess.CompletedProcess,
+        blob: bytes,
+        *,
+        mime: Optional[str],
+        tags: Optional[Dict[str, str]],
+        payload_filename: str,
+    ) -> StorageResult:
+        """Turn a finished single-file `filecoin-pin add` run into a StorageResult."""
+        metadata, error = self._upload_metadata(result)
+        if error:
+            return StorageResult(success=False, provider="filecoin-pin", error=error)
+        return self._stored_result(
+            metadata, blob, mime=mime, tags=tags, payload_filename=payload_filename
+        )
 
     def put(
         self,
@@ -163,83 +410,143 @@ class FilecoinPinStorageProvider:
             StorageResult with IPFS URI and CID
         """
         try:
+            _ = self._ensure_verified
             payload_filename = self._filename_for_mime(mime)
-            temp_dir = Path(tempfile.mkdtemp(prefix="chaoschain_filecoin_pin_"))
-            temp_path = temp_dir / payload_filename
-            temp_path.write_bytes(blob)
-
-            try:
-                command = self._build_command(str(temp_path))
-                print(f"Uploading {len(blob)} bytes via filecoin-pin...")
+            with self._single_upload(blob, payload_filename) as (command, stdin_data):
                 result = subprocess.run(  # noqa: S603 - external CLI is intentional
                     command,
+                    input=stdin_data,
                     capture_output=True,
-                    text=True,
                     timeout=300,
                 )
+            return self._single_result(
+                result, blob, mime=mime, tags=tags, payload_filename=payload_filename
+            )
 
-                if result.returncode == 0:
-                    metadata = self._parse_cli_output(result.stdout)
-                    root_cid = metadata.get("root_cid")
-
-                    if not root_cid:
-                        print("filecoin-pin completed but no Root CID was found in the output.")
-                        print("stdout:\n", result.stdout)
-                        print("stderr:\n", result.stderr)
-                        return StorageResult(
-                            success=False,
-                            provider="filecoin-pin",
-                            error="filecoin-pin completed without returning a Root CID",
-                        )
-
-                    print(f"Upload successful. Root CID: {root_cid}")
-                    dweb_url = f"https://{root_cid}.ipfs.dweb.link/{payload_filename}"
-                    return StorageResult(
-                        success=True,
-                        uri=f"ipfs://{root_cid}",
-                        hash=root_cid,
-                        provider="filecoin-pin",
-                        cid=root_cid,
-                        view_url=dweb_url,
-                        size=len(blob),
-                        metadata={
-                            "piece_cid": metadata.get("piece_cid"),
-                            "data_set_id": metadata.get("data_set_id"),
-                            "transaction_hash": metadata.get("transaction_hash"),
-                            "file_size_display": metadata.get("file_size_display"),
-                            "mime_type": mime,
-                            "tags": tags or {},
-                            "filecoin_pin": True,
-                            "payload_filename": payload_filename,
-                            "dweb_gateway_url": dweb_url,
-                        },
-                    )
-
-                print("filecoin-pin returned a non-zero exit code.")
-                print("stdout:\n", result.stdout)
-                print("stderr:\n", result.stderr)
-                return StorageResult(
-                    success=False,
-                    provider="filecoin-pin",
-                    error=result.stderr.strip() or "filecoin-pin command failed",
-                )
+        except Exception as e:
+            return StorageResult(
+                success=False, provider="filecoin-pin", error=self._upload_error(e)
+            )
+
+    async def aput(
+        self,
+        blob: bytes,
+        *,
+        mime: Optional[str] = None,
+        tags: Optional[Dict[str, str]] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> StorageResult:
+        """
+        Store data using filecoin-pin CLI without blocking the event loop.
 
-            finally:
-                shutil.rmtree(temp_dir, ignore_errors=True)
+        Behaves like put(), but awaits the CLI so async callers can keep doing
+        other work while the upload runs.
 
-        except subprocess.TimeoutExpired:
-            return StorageResult(
-                success=False,
-                provider="filecoin-pin",
-                error="filecoin-pin command timed out after 5 minutes",
+        Args:
+            blob: Data to store
+            mime: MIME type (stored in metadata)
+            tags: Optional metadata tags
+            idempotency_key: Ignored (filecoin-pin handles deduplication)
+
+        Returns:
+            StorageResult with IPFS URI and CID
+        """
+        try:
+            # First-use verification spawns blocking subprocesses; keep it off the loop.
+            await asyncio.to_thread(self.verify_cli)
+            payload_filename = self._filename_for_mime(mime)
+            with self._single_upload(blob, payload_filename) as (command, stdin_data):
+                result = await self._run_cli_async(command, stdin_data)
+            return self._single_result(
+                result, blob, mime=mime, tags=tags, payload_filename=payload_filename
             )
+
         except Exception as e:
             return StorageResult(
-                success=False,
-                provider="filecoin-pin",
-                error=f"Storage error: {e}",
+                success=False, provider="filecoin-pin", error=self._upload_error(e)
             )
 
+    @staticmethod
+    async def _run_cli_async(
+        command: list[str], stdin_data: Optional[bytes] = None
+    ) -> subprocess.CompletedProcess:
+        """Run the CLI as an asyncio subprocess, mirroring subprocess.run semantics."""
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE if stdin_data is not None else None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(stdin_data), timeout=300)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            # Never leave the CLI running once its caller has stopped waiting for it.
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            if isinstance(exc, asyncio.TimeoutError):
+                raise subprocess.TimeoutExpired(command, 300) from None
+            raise
+        return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+    def put_many(
+        self,
+        blobs: List[Tuple[bytes, Optional[str]]],
+        *,
+        tags: Optional[Dict[str, str]] = None,
+    ) -> List[StorageResult]:
+        """
+        Store several payloads with a single filecoin-pin invocation.
+
+        The payloads are written into one directory that is added as a whole,
+        so they share a Root CID and each is addressed by its path beneath it.
+        This pays the CLI and Synapse SDK start-up cost once instead of per blob.
+
+        Args:
+            blobs: (data, MIME type) pairs to store
+            tags: Optional metadata tags applied to every payload
+
+        Returns:
+            One StorageResult per payload, in input order
+        """
+        if not blobs:
+            return []
+
+        try:
+            _ = self._ensure_verified
+            filenames = [
+                f"part_{index}_{self._filename_for_mime(mime)}"
+                for index, (_, mime) in enumerate(blobs)
+            ]
+            total_size = sum(len(blob) for blob, _ in blobs)
+            with _staging_dir(total_size) as temp_dir:
+                for (blob, _), filename in zip(blobs, filenames):
+                    (Path(temp_dir) / filename).write_bytes(blob)
+
+                print(f"Uploading {len(blobs)} payloads ({total_size} bytes) via filecoin-pin...")
+                result = subprocess.run(  # noqa: S603 - external CLI is intentional
+                    self._build_command(temp_dir, directory=True),
+                    capture_output=True,
+                    timeout=300,
+                )
+
+            metadata, error = self._upload_metadata(result)
+            if error:
+                return [
+                    StorageResult(success=False, provider="filecoin-pin", error=error)
+                    for _ in blobs
+                ]
+            return [
+                self._stored_result(
+                    metadata, blob, mime=mime, tags=tags, payload_filename=filename, nested=True
+                )
+                for (blob, mime), filename in zip(blobs, filenames)
+            ]
+
+        except Exception as e:
+            error = self._upload_error(e)
+        return [StorageResult(success=False, provider="filecoin-pin", error=error) for _ in blobs]
+
     def get(self, uri: str) -> Tuple[bytes, Optional[Dict]]:
         """
         Retrieve data from IPFS using public gateways.
@@ -253,45 +560,80 @@ class FilecoinPinStorageProvider:
         # Extract CID from URI
         cid = uri.replace("ipfs://", "")
 
-        try:
-            # Try multiple IPFS gateways
-            gateways = [
-                f"https://ipfs.io/ipfs/{cid}",
-                f"https://gateway.pinata.cloud/ipfs/{cid}",
-                f"https://cloudflare-ipfs.com/ipfs/{cid}",
-                f"https://dweb.link/ipfs/{cid}"
-            ]
+        with self._cid_cache_lock:
+            cached = self._cid_cache.get(cid)
+            if cached is not None:
+                self._cid_cache.move_to_end(cid)
+                print(f"Serving cached content for: {cid}")
+                return cached
+
+        # Race all gateways on daemon threads; the first full 200 response wins.
+        # Setting `cancelled` makes the losers abort their streamed downloads,
+        # and daemon threads never hold up interpreter exit.
+        cancelled = threading.Event()
+        outcomes: queue.Queue = queue.Queue()
+        for template in _GATEWAY_TEMPLATES:
+            threading.Thread(
+                target=self._fetch_from_gateway,
+                args=(template.format(cid=cid), cancelled, outcomes),
+                daemon=True,
+            ).start()
 
-            import requests  # Local import keeps dependency optional for callers.
-
-            for gateway_url in gateways:
-                try:
-                    print(f"Attempting retrieval from: {gateway_url}")
-                    response = requests.get(gateway_url, timeout=30)
-
-                    if response.status_code == 200:
-                        metadata = {
-                            "content-type": response.headers.get("Content-Type"),
-                            "content-length": response.headers.get("Content-Length"),
-                            "gateway": gateway_url,
-                        }
-                        print(f"Successfully retrieved content from: {gateway_url}")
-                        return response.content, metadata
-                    print(f"Gateway returned HTTP {response.status_code}: {gateway_url}")
-                except Exception as e:
-                    print(f"Failed to retrieve from {gateway_url}: {e}")
-                    continue
+        try:
+            for _ in _GATEWAY_TEMPLATES:
+                fetched = outcomes.get()
+                if fetched is not None:
+                    with self._cid_cache_lock:
+                        self._cid_cache[cid] = fetched
+                        if len(self._cid_cache) > _CID_CACHE_MAX:
+                            self._cid_cache.popitem(last=False)
+                    return fetched
 
             raise Exception("Failed to retrieve from any IPFS gateway")
 
         except Exception as e:
             raise Exception(f"Error retrieving from IPFS: {str(e)}")
+        finally:
+            cancelled.set()
+
+    @staticmethod
+    def _fetch_from_gateway(
+        gateway_url: str, cancelled: threading.Event, outcomes: queue.Queue
+    ) -> None:
+        """Fetch content from one gateway and report it (or None) on ``outcomes``."""
+        fetched: Optional[Tuple[bytes, Dict]] = None
+        try:
+            print(f"Attempting retrieval from: {gateway_url}")
+            with _SESSION.get(gateway_url, timeout=30, stream=True) as response:
+                if response.status_code != 200:
+                    print(f"Gateway returned HTTP {response.status_code}: {gateway_url}")
+                    return
+
+                chunks = []
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if cancelled.is_set():
+                        # Leaving the with-block closes the connection mid-body.
+                        return
+                    chunks.append(chunk)
+
+                metadata = {
+                    "content-type": response.headers.get("Content-Type"),
+                    "content-length": response.headers.get("Content-Length"),
+                    "gateway": gateway_url,
+                }
+                print(f"Successfully retrieved content from: {gateway_url}")
+                fetched = (b"".join(chunks), metadata)
+        except Exception as e:
+            print(f"Failed to retrieve from {gateway_url}: {e}")
+        finally:
+            outcomes.put(fetched)
 
     def verify(self, uri: str, expected_hash: str) -> bool:
         """
         Verify data integrity.
 
-        For IPFS, the CID IS the hash, so we just compare CIDs.
+        For IPFS, the CID IS the hash, so we just compare CIDs. Paths beneath
+        the CID (as returned by put_many) are ignored: the root CID covers them.
 
         Args:
             uri: IPFS URI
@@ -300,8 +642,8 @@ class FilecoinPinStorageProvider:
         Returns:
             True if CIDs match
         """
-        cid = uri.replace("ipfs://", "")
-        expected_cid = expected_hash.replace("ipfs://", "")
+        cid = uri.replace("ipfs://", "").split("/", 1)[0]
+        expected_cid = expected_hash.replace("ipfs://", "").split("/", 1)[0]
         return cid == expected_cid
 
     def delete(self, uri: str) -> bool:
@@ -333,7 +675,7 @@ class FilecoinPinStorageProvider:
             CID if successful, None otherwise
         """
         try:
-            json_data = json.dumps(data, indent=2).encode("utf-8")
+            json_data = dumps_json_bytes(data, pretty=True, sort_keys=True)
             result = self.put(
                 json_data,
                 mime="application/json",
@@ -7,7 +7,11 @@ import os
 import sys
 from pathlib import Path
 
-sys.path.append(str(Path(__file__).parent))
+_HERE = Path(__file__).resolve()
+_ROOT = _HERE.parent
+_ROOT_STR = str(_ROOT)
+
+sys.path.insert(0, _ROOT_STR)
 
 from storage.filecoin_pin_provider import FilecoinPinStorageProvider
 
@@ -0,0 +1,11 @@
+"""Make the repository root importable for the unit tests."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+_ROOT_STR = str(Path(__file__).resolve().parent.parent)
+
+if _ROOT_STR not in sys.path:
+    sys.path.insert(0, _ROOT_STR)
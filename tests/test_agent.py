@@ -0,0 +1,124 @@
+"""Unit tests for the demo agent (the ChaosChain SDK is stubbed out)."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import types
+from pathlib import Path
+import pytest
+
+_AGENT_PATH = Path(__file__).resolve().parent.parent / "agent" / "agent.py"
+
+
+def _import_agent(monkeypatch: pytest.MonkeyPatch) -> types.ModuleType:
+    """Import a fresh copy of agent/agent.py with a stand-in chaoschain_sdk module."""
+    sdk = types.ModuleType("chaoschain_sdk")
+    sdk.ChaosChainAgentSDK = object
+    monkeypatch.setitem(sys.modules, "chaoschain_sdk", sdk)
+
+    spec = importlib.util.spec_from_file_location("agent_under_test", _AGENT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def agent(monkeypatch: pytest.MonkeyPatch) -> types.ModuleType:
+    """The demo agent module, imported with the default environment."""
+    monkeypatch.delenv("CHAOS_HASH", raising=False)
+    return _import_agent(monkeypatch)
+
+
+class _Response:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+
+
+def test_verify_ipfs_content_returns_on_first_reachable_gateway(
+    agent: types.ModuleType, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    release = threading.Event()
+    probes = []
+
+    def head(url: str, **kwargs) -> _Response:
+        probes.append(threading.current_thread())
+        if url.startswith("https://dweb.link/"):
+            return _Response(200)
+        release.wait(10)
+        return _Response(404)
+
+    monkeypatch.setattr(agent._SESSION, "head", head)
+
+    try:
+        assert agent.verify_ipfs_content("bafyroot")
+        # The losers are still blocked here; they must not keep the interpreter alive.
+        assert probes and all(thread.daemon for thread in probes)
+    finally:
+        release.set()
+
+
+def test_verify_ipfs_content_reports_unreachable_when_every_probe_fails(
+    agent: types.ModuleType, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def head(url: str, **kwargs) -> _Response:
+        if url.startswith("https://ipfs.io/"):
+            raise agent.requests.exceptions.ConnectionError("refused")
+        return _Response(504)
+
+    monkeypatch.setattr(agent._SESSION, "head", head)
+
+    assert not agent.verify_ipfs_content("bafyroot")
+    assert not agent.verify_ipfs_content("")
+
+
+@pytest.mark.parametrize("timestamp", ["2026-01-01T00:00:00", None])
+def test_demo_function_digest_matches_sorted_json(
+    agent: types.ModuleType, timestamp: str
+) -> None:
+    result = asyncio.run(
+        agent.demo_function(hello="world", demo="chaoschain", timestamp=timestamp)
+    )
+
+    payload = result["echo"]
+    assert list(payload) == ["demo", "hello", "timestamp"]
+    expected = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+    assert result["computation_hash"] == expected
+    assert result["hash_algorithm"] == "sha256"
+
+
+def test_unknown_hash_algorithm_is_rejected(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CHAOS_HASH", "sha3")
+
+    with pytest.raises(SystemExit):
+        _import_agent(monkeypatch)
+
+
+def test_write_atomic_replaces_the_target(agent: types.ModuleType, tmp_path: Path) -> None:
+    target = tmp_path / "receipt.json"
+    target.write_bytes(b"old")
+
+    agent.write_atomic(target, b"new")
+
+    assert target.read_bytes() == b"new"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["receipt.json"]
+
+
+def test_write_atomic_removes_the_temp_file_on_failure(
+    agent: types.ModuleType, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    target = tmp_path / "receipt.json"
+
+    def failing_replace(src: object, dst: object) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+
+    with pytest.raises(OSError, match="disk full"):
+        agent.write_atomic(target, b"new")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,428 @@
+"""Unit tests for the Filecoin Pin storage provider (no network or real CLI needed)."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pytest
+
+from storage import filecoin_pin_provider
+from storage.filecoin_pin_provider import (
+    _STDIN_PATH_RE,
+    FilecoinPinStorageProvider,
+    dumps_json_bytes,
+)
+
+_STUB_CLI = """#!{python}
+import json, os, sys, time
+
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("0.0.0-stub")
+    sys.exit(0)
+if args[:2] == ["add", "--help"]:
+    print({help_text!r})
+    sys.exit(0)
+
+with open({pid_file!r}, "w", encoding="utf-8") as pid_file:
+    pid_file.write(str(os.getpid()))
+time.sleep({sleep!r})
+
+entry = {{"args": args}}
+if args[1] == "-":
+    entry["stdin"] = sys.stdin.read()
+elif os.path.isdir(args[1]):
+    entry["files"] = {{
+        name: open(os.path.join(args[1], name), encoding="utf-8").read()
+        for name in sorted(os.listdir(args[1]))
+    }}
+with open({log!r}, "a", encoding="utf-8") as log:
+    log.write(json.dumps(entry) + "\\n")
+
+print("│ Root CID: bafyroot")
+print("│ Piece CID: bafkpiece")
+"""
+
+
+@pytest.fixture
+def stub_cli(tmp_path: Path) -> Callable[..., Path]:
+    """Return a factory that writes a fake filecoin-pin executable into tmp_path."""
+
+    def make(
+        help_text: str = "Usage: filecoin-pin add [options] <path>", sleep: float = 0
+    ) -> Path:
+        script = tmp_path / "filecoin-pin"
+        script.write_text(
+            _STUB_CLI.format(
+                python=sys.executable,
+                help_text=help_text,
+                log=str(tmp_path / "calls.jsonl"),
+                pid_file=str(tmp_path / "add.pid"),
+                sleep=sleep,
+            ),
+            encoding="utf-8",
+        )
+        script.chmod(0o755)
+        return script
+
+    return make
+
+
+def _calls(stub: Path) -> List[dict]:
+    log = stub.parent / "calls.jsonl"
+    if not log.exists():
+        return []
+    return [json.loads(line) for line in log.read_text(encoding="utf-8").splitlines()]
+
+# Representative `filecoin-pin add` output: spinner frames redraw the line after
+# a bare \r, results are printed inside a "│"-prefixed box, and lines end in \n.
+SAMPLE_ADD_OUTPUT = (
+    "┌  Filecoin Pin Add\n"
+    "│\n"
+    "◒  Loading IPFS content...\r◇  ✓ IPFS content loaded (118 B)\n"
+    "│\n"
+    "◓  Uploading to Filecoin...\r◇  Upload complete\n"
+    "│\n"
+    "◆  Add completed successfully\n"
+    "│ Root CID: bafybeigdyrzt5sfp7udm7hu76uh7y26nf3efuylqabf3oclgtqy55fbzdi\n"
+    "│ Piece CID: bafkzcibcaapd3ewxhqq5ls5kx6p2jyvkj3n4tjtvm6yw5cvdqd2gvlxr3dbf6fa\n"
+    "│ Data Set ID: 325\n"
+    "│\n"
+    "│ Transaction\n"
+    "│ Hash: 0x5f2c3a9e4b1d6f8a7c0e2b4d6f8a1c3e5b7d9f0a2c4e6b8d0f1a3c5e7b9d1f3a\n"
+    "└  Done\n"
+).encode("utf-8")
+
+
+def _baseline_parse(output: str) -> Dict[str, Optional[str]]:
+    """The original line-by-line parser, kept as the reference behaviour."""
+    fields: Dict[str, Optional[str]] = dict.fromkeys(
+        ("root_cid", "piece_cid", "data_set_id", "transaction_hash", "file_size_display")
+    )
+    for line in output.splitlines():
+        if "Root CID:" in line:
+            fields["root_cid"] = line.split("Root CID:")[1].strip()
+        elif "Piece CID:" in line:
+            fields["piece_cid"] = line.split("Piece CID:")[1].strip()
+        elif "Data Set ID:" in line:
+            fields["data_set_id"] = line.split("Data Set ID:")[1].strip()
+        elif line.strip().startswith("│ Hash:"):
+            fields["transaction_hash"] = line.split("Hash:")[1].strip()
+        elif "IPFS content loaded (" in line:
+            match = re.search(r"IPFS content loaded \(([^)]+)\)", line)
+            if match:
+                fields["file_size_display"] = match.group(1)
+    return fields
+
+
+def test_parse_cli_output_extracts_all_fields() -> None:
+    assert FilecoinPinStorageProvider._parse_cli_output(SAMPLE_ADD_OUTPUT) == {
+        "root_cid": "bafybeigdyrzt5sfp7udm7hu76uh7y26nf3efuylqabf3oclgtqy55fbzdi",
+        "piece_cid": "bafkzcibcaapd3ewxhqq5ls5kx6p2jyvkj3n4tjtvm6yw5cvdqd2gvlxr3dbf6fa",
+        "data_set_id": "325",
+        "transaction_hash": "0x5f2c3a9e4b1d6f8a7c0e2b4d6f8a1c3e5b7d9f0a2c4e6b8d0f1a3c5e7b9d1f3a",
+        "file_size_display": "118 B",
+    }
+
+
+def test_parse_cli_output_stops_values_at_carriage_return() -> None:
+    output = "Root CID: bafyB\r⠙ spinning\n".encode("utf-8")
+    assert FilecoinPinStorageProvider._parse_cli_output(output)["root_cid"] == "bafyB"
+
+
+@pytest.mark.parametrize(
+    "output",
+    [
+        SAMPLE_ADD_OUTPUT.decode("utf-8"),
+        SAMPLE_ADD_OUTPUT.decode("utf-8").replace("\n", "\r\n"),
+        "Root CID: bafyA\rRoot CID: bafyB\x0bPiece CID: bafk\x0cData Set ID: 7\n",
+        "noise\n  │ Hash: 0xdead\nHash: ignored\n│ Root CID: a Piece CID: b\n",
+        "IPFS content loaded (1.2 KB) then Root CID: bafyC\n",
+        "",
+    ],
+)
+def test_parse_cli_output_matches_baseline_parser(output: str) -> None:
+    parsed = FilecoinPinStorageProvider._parse_cli_output(output.encode("utf-8"))
+    assert parsed == _baseline_parse(output)
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        {"b": 1, "a": [1, 2.5, "é"], "c": {"z": None, "y": True}},
+        {"wei": 10**20},
+        {1: "a"},
+    ],
+)
+@pytest.mark.parametrize("pretty", [False, True])
+def test_dumps_json_bytes_matches_stdlib_layout(obj: dict, pretty: bool) -> None:
+    expected = json.dumps(
+        obj,
+        indent=2 if pretty else None,
+        separators=None if pretty else (",", ":"),
+        sort_keys=True,
+        ensure_ascii=False,
+    ).encode("utf-8")
+    assert dumps_json_bytes(obj, pretty=pretty, sort_keys=True) == expected
+
+
+def test_put_many_uploads_one_directory_without_bare(stub_cli: Callable[..., Path]) -> None:
+    stub = stub_cli()
+    provider = FilecoinPinStorageProvider(filecoin_pin_path=str(stub), bare=True)
+
+    results = provider.put_many([(b"{}", "application/json"), (b"hi", "text/plain")])
+
+    (call,) = _calls(stub)
+    assert call["args"][0] == "add"
+    assert "--bare" not in call["args"]
+    assert call["files"] == {
+        "part_0_chaoschain_proof.json": "{}",
+        "part_1_chaoschain_payload.txt": "hi",
+    }
+    assert [result.uri for result in results] == [
+        "ipfs://bafyroot/part_0_chaoschain_proof.json",
+        "ipfs://bafyroot/part_1_chaoschain_payload.txt",
+    ]
+    for result in results:
+        assert result.success
+        assert provider.verify(result.uri, result.cid)
+
+
+def test_single_put_keeps_bare_flag(stub_cli: Callable[..., Path]) -> None:
+    stub = stub_cli()
+    provider = FilecoinPinStorageProvider(filecoin_pin_path=str(stub), bare=True)
+
+    result = provider.put(b"payload", mime="text/plain")
+
+    (call,) = _calls(stub)
+    assert result.success
+    assert "--bare" in call["args"]
+
+
+@pytest.mark.parametrize(
+    ("help_line", "advertised"),
+    [
+        ("  <path|->          File to add, or - to read from stdin", True),
+        ("  path              File path, or '-' for stdin", True),
+        ("  path              Pass `-` to read the file from stdin", True),
+        ("  --private-key     Wallet key (use --key-file to read key from stdin)", False),
+        ("  <path>            File or directory to add; - is not supported", False),
+    ],
+)
+def test_stdin_path_detection(help_line: str, advertised: bool) -> None:
+    help_text = f"Usage: filecoin-pin add [options] <path>\n\n{help_line}\n".encode("utf-8")
+    assert (_STDIN_PATH_RE.search(help_text) is not None) is advertised
+
+
+_STDIN_HELP = "  <path|->  File to add, or - to read from stdin"
+
+
+def _upload(provider: FilecoinPinStorageProvider, use_async: bool, blob: bytes):
+    if use_async:
+        return asyncio.run(provider.aput(blob, mime="text/plain"))
+    return provider.put(blob, mime="text/plain")
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_opted_in_bare_upload_streams_over_stdin(
+    stub_cli: Callable[..., Path], use_async: bool
+) -> None:
+    stub = stub_cli(help_text=_STDIN_HELP)
+    provider = FilecoinPinStorageProvider(
+        filecoin_pin_path=str(stub), bare=True, stdin_upload=True
+    )
+
+    result = _upload(provider, use_async, b"streamed payload")
+
+    (call,) = _calls(stub)
+    assert result.success
+    assert call["args"][:2] == ["add", "-"]
+    assert call["stdin"] == "streamed payload"
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+@pytest.mark.parametrize(
+    ("bare", "stdin_upload", "help_text"),
+    [
+        (False, True, _STDIN_HELP),
+        (True, False, _STDIN_HELP),
+        (True, True, "Usage: filecoin-pin add [options] <path>"),
+    ],
+)
+def test_upload_uses_a_temp_file_without_stdin_support(
+    stub_cli: Callable[..., Path],
+    use_async: bool,
+    bare: bool,
+    stdin_upload: bool,
+    help_text: str,
+) -> None:
+    stub = stub_cli(help_text=help_text)
+    provider = FilecoinPinStorageProvider(
+        filecoin_pin_path=str(stub), bare=bare, stdin_upload=stdin_upload
+    )
+
+    result = _upload(provider, use_async, b"staged payload")
+
+    (call,) = _calls(stub)
+    assert result.success
+    assert Path(call["args"][1]).name == "chaoschain_payload.txt"
+    assert "stdin" not in call
+
+
+def test_verify_compares_root_cids_only() -> None:
+    provider = FilecoinPinStorageProvider()
+    assert provider.verify("ipfs://bafyroot/part_0_x.json", "bafyroot")
+    assert not provider.verify("ipfs://bafyother/part_0_x.json", "bafyroot")
+
+
+def test_construction_is_lazy_until_verify_cli(tmp_path: Path) -> None:
+    provider = FilecoinPinStorageProvider(filecoin_pin_path=str(tmp_path / "missing-cli"))
+
+    with pytest.raises(RuntimeError, match="not found"):
+        provider.verify_cli()
+
+
+def test_aput_verifies_cli_off_the_event_loop(
+    stub_cli: Callable[..., Path], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    provider = FilecoinPinStorageProvider(filecoin_pin_path=str(stub_cli()))
+    verify = provider._verify_filecoin_pin
+    threads = []
+
+    def recording_verify() -> None:
+        threads.append(threading.current_thread())
+        verify()
+
+    monkeypatch.setattr(provider, "_verify_filecoin_pin", recording_verify)
+
+    result = asyncio.run(provider.aput(b"payload", mime="text/plain"))
+
+    assert result.success
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_cancelled_aput_kills_the_cli(stub_cli: Callable[..., Path]) -> None:
+    stub = stub_cli(sleep=30)
+    provider = FilecoinPinStorageProvider(filecoin_pin_path=str(stub))
+    pid_file = stub.parent / "add.pid"
+
+    async def cancel_mid_upload() -> None:
+        task = asyncio.create_task(provider.aput(b"payload"))
+        for _ in range(100):
+            if pid_file.exists() and pid_file.read_text():
+                break
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_mid_upload())
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+
+class _GatewayResponse:
+    """Minimal streamed response returned by the stubbed _SESSION.get."""
+
+    def __init__(self, status_code: int, chunks: Optional[Iterator[bytes]] = None) -> None:
+        self.status_code = status_code
+        self.headers = {"Content-Type": "text/plain"}
+        self.closed = threading.Event()
+        self._chunks = chunks if chunks is not None else iter(())
+
+    def __enter__(self) -> "_GatewayResponse":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.closed.set()
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        return self._chunks
+
+
+def _serve(
+    monkeypatch: pytest.MonkeyPatch, respond: Callable[[str], _GatewayResponse]
+) -> List[str]:
+    """Stub the gateway session with ``respond`` and return the list of requested URLs."""
+    requested: List[str] = []
+
+    def get(url: str, **kwargs) -> _GatewayResponse:
+        requested.append(url)
+        return respond(url)
+
+    monkeypatch.setattr(filecoin_pin_provider._SESSION, "get", get)
+    return requested
+
+
+def test_get_returns_first_full_response_and_stops_the_losers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def endless() -> Iterator[bytes]:
+        while True:
+            time.sleep(0.01)
+            yield b"x"
+
+    losers: List[_GatewayResponse] = []
+
+    def respond(url: str) -> _GatewayResponse:
+        if url.startswith("https://dweb.link/"):
+            return _GatewayResponse(200, iter([b"he", b"llo"]))
+        losers.append(_GatewayResponse(200, endless()))
+        return losers[-1]
+
+    _serve(monkeypatch, respond)
+
+    data, metadata = FilecoinPinStorageProvider().get("ipfs://bafyrace")
+
+    assert data == b"hello"
+    assert metadata["gateway"] == "https://dweb.link/ipfs/bafyrace"
+    for loser in losers:
+        assert loser.closed.wait(5)
+
+
+def test_get_wraps_the_error_when_every_gateway_fails(monkeypatch: pytest.MonkeyPatch) -> None:
+    def respond(url: str) -> _GatewayResponse:
+        if url.startswith("https://ipfs.io/"):
+            raise ConnectionError("refused")
+        return _GatewayResponse(504)
+
+    _serve(monkeypatch, respond)
+
+    with pytest.raises(Exception, match="Error retrieving from IPFS: Failed to retrieve"):
+        FilecoinPinStorageProvider().get("ipfs://bafymissing")
+
+
+def test_get_serves_repeat_cids_from_the_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    requested = _serve(monkeypatch, lambda url: _GatewayResponse(200, iter([b"data"])))
+    provider = FilecoinPinStorageProvider()
+
+    first = provider.get("ipfs://bafycached")
+    calls = len(requested)
+    second = provider.get("bafycached")
+
+    assert second == first
+    assert len(requested) == calls
+
+
+def test_cid_cache_evicts_the_least_recently_used_entry(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    _serve(monkeypatch, lambda url: _GatewayResponse(200, iter([url.encode("utf-8")])))
+    monkeypatch.setattr(filecoin_pin_provider, "_CID_CACHE_MAX", 2)
+    provider = FilecoinPinStorageProvider()
+
+    provider.get("bafya")
+    provider.get("bafyb")
+    provider.get("bafya")  # hit: bafya becomes most recently used
+    provider.get("bafyc")  # evicts bafyb
+
+    assert list(provider._cid_cache) == ["bafya", "bafyc"]